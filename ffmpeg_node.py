@@ -1,19 +1,831 @@
 import os
+import sys
 import subprocess
 import re
+import shlex
+import tempfile
+import hashlib
+import uuid
 import time
 import json
-from datetime import datetime
-from urllib.parse import urlparse
+import queue
+import threading
+import functools
+import contextlib
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import urllib.request
+import urllib.parse
 
 # Try to import ComfyUI modules, but don't fail if they're not available
 try:
     import folder_paths
     from server import PromptServer
+    import comfy.model_management as model_management
+    import comfy.utils
     COMFYUI_AVAILABLE = True
 except ImportError:
     COMFYUI_AVAILABLE = False
 
+# Raised by ComfyUI when the user cancels a prompt; it must reach ComfyUI's executor,
+# so the node's own error handling lets it through
+if COMFYUI_AVAILABLE:
+    _INTERRUPT_EXCEPTIONS = (model_management.InterruptProcessingException,)
+else:
+    _INTERRUPT_EXCEPTIONS = ()
+
+# fcntl is only available on POSIX systems
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Input duration from the FFmpeg log banner
+_RE_DURATION = re.compile(r'Duration: (\d{2}):(\d{2}):(\d{2})\.\d{2}')
+# Global options making FFmpeg report progress as key=value lines on stderr
+_PROGRESS_ARGS = ['-progress', 'pipe:2', '-nostats']
+# Keys of FFmpeg's -progress report (plus per-stream "stream_N_M_q" entries)
+_PROGRESS_KEYS = frozenset([
+    'frame', 'fps', 'bitrate', 'total_size', 'out_time_us', 'out_time_ms', 'out_time',
+    'dup_frames', 'drop_frames', 'speed', 'progress'
+])
+# Optional SMART_CONCAT overrides: trim1=start:end trim2=start:end crf=N preset=name
+_RE_HINTS = re.compile(
+    r'trim1=(?P<t1s>\d+\.?\d*):(?P<t1e>\d+\.?\d*)'
+    r'|trim2=(?P<t2s>\d+\.?\d*):(?P<t2e>\d+\.?\d*)'
+    r'|crf=(?P<crf>\d+)'
+    r'|preset=(?P<preset>\w+)'
+)
+# Input references and keywords run_ffmpeg validates/dispatches on, found in one scan
+_RE_CMD_SCAN = re.compile(r'\[[12]:[va]\]|\{input3\}|SMART_CONCAT', re.IGNORECASE)
+# HTTP/HTTPS URL with a non-empty host and no whitespace
+_RE_URL = re.compile(r'https?://[^\s/?#]+(?:[/?#]\S*)?', re.IGNORECASE)
+# FFmpeg separates status updates with \r and log lines with \n
+_RE_LINE_BREAK = re.compile(rb'[\r\n]+')
+
+# Kernel pipe buffer requested on Linux so ffmpeg can run ahead of the reader
+_PIPE_BUFFER_SIZE = 1 << 20
+# Read up to a full pipe buffer per syscall
+_READ_CHUNK_SIZE = _PIPE_BUFFER_SIZE
+_F_SETPIPE_SZ = getattr(fcntl, 'F_SETPIPE_SZ', 1031)
+# Number of trailing FFmpeg output lines kept for error reporting
+_OUTPUT_TAIL_LINES = 200
+# Minimum time between two printed progress lines, in seconds
+_PROGRESS_PRINT_INTERVAL = 0.25
+
+
+def _enlarge_pipe(pipe):
+    """
+    Grow the kernel buffer of pipe on Linux (best effort, default size is 64 KB).
+    """
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return
+    try:
+        fcntl.fcntl(pipe.fileno(), _F_SETPIPE_SZ, _PIPE_BUFFER_SIZE)
+    except OSError:
+        # Size may exceed /proc/sys/fs/pipe-max-size for unprivileged users
+        pass
+
+
+def _iter_output_lines(pipe):
+    """
+    Read an unbuffered binary pipe in large chunks and yield each complete line as a stripped string.
+    """
+    # One buffer per ffmpeg run is reused by every read. Chunks are split straight out of it,
+    # only a partial line carried over from the previous read forces a copy.
+    buffer = bytearray(_READ_CHUNK_SIZE)
+    view = memoryview(buffer)
+    pending = b''
+    while True:
+        count = pipe.readinto(buffer)
+        if not count:
+            break
+        data = pending + view[:count] if pending else view[:count]
+        parts = _RE_LINE_BREAK.split(data)
+        # The last fragment may be an incomplete line, keep it for the next chunk
+        pending = parts.pop()
+        for part in parts:
+            line = part.decode('utf-8', 'replace').strip()
+            if line:
+                yield line
+    line = pending.decode('utf-8', 'replace').strip()
+    if line:
+        yield line
+
+
+def _with_progress_args(command):
+    """
+    Return an ffmpeg argv with _PROGRESS_ARGS added; other commands are returned unchanged.
+    """
+    program = os.path.basename(command[0]).lower() if command else ''
+    if program not in ('ffmpeg', 'ffmpeg.exe') or '-progress' in command:
+        return command
+    return [command[0], *_PROGRESS_ARGS, *command[1:]]
+
+
+def _parse_hints(command):
+    """
+    Return the SMART_CONCAT parameter hints in command as a dict of _RE_HINTS group
+    names to strings. The command is scanned once; the first occurrence of each wins.
+    """
+    hints = {}
+    for match in _RE_HINTS.finditer(command):
+        for name, value in match.groupdict().items():
+            if value is not None:
+                hints.setdefault(name, value)
+    return hints
+
+
+def _split_command(command):
+    """
+    Split a custom command template into an argv list.
+    Windows paths keep their backslashes: on Windows the split is non-POSIX, which
+    leaves quotes in place, so they are removed from quoted tokens here.
+    Raises ValueError for unbalanced quotes.
+    """
+    if os.name != 'nt':
+        return shlex.split(command)
+    return [
+        token[1:-1] if len(token) >= 2 and token[0] == token[-1] and token[0] in '"\'' else token
+        for token in shlex.split(command, posix=False)
+    ]
+
+
+def _pump_output(pipe, events, duration=None):
+    """
+    Parse FFmpeg output from pipe and put events on the events queue.
+    duration is the expected output length in seconds; if None, the first Duration: line
+    of the log (the first input's length) is used instead.
+    Events are ('log', line), ('duration', seconds),
+    ('progress', percent, current_time, duration, fps, speed) and ('message', line),
+    always followed by a final ('eof',).
+    """
+    report = {}
+    try:
+        if duration:
+            events.put(('duration', duration))
+        for line in _iter_output_lines(pipe):
+            # -progress report lines: collect until the closing "progress=..." line
+            key, sep, value = line.partition('=')
+            if sep and (key in _PROGRESS_KEYS or key.startswith('stream_')):
+                report[key] = value
+                if key == 'progress' and duration:
+                    out_time_us = report.get('out_time_us', report.get('out_time_ms', ''))
+                    if out_time_us.isdigit():
+                        current_time = int(out_time_us) // 1000000
+                        # The final report counts as done even if the estimate was too long
+                        if value == 'end':
+                            progress_percent = 100
+                        else:
+                            progress_percent = min(100, (current_time / duration) * 100)
+                        fps = report.get('fps', 'N/A')
+                        speed = report.get('speed', 'N/A').rstrip('x').strip()
+                        events.put(('progress', progress_percent, current_time, duration, fps, speed))
+                    report = {}
+                continue
+            
+            events.put(('log', line))
+            
+            # Parse duration from FFmpeg output (only until it is known)
+            if duration is None and "Duration:" in line:
+                duration_match = _RE_DURATION.search(line)
+                if duration_match:
+                    hours, minutes, seconds = map(int, duration_match.groups())
+                    duration = hours * 3600 + minutes * 60 + seconds
+                    events.put(('duration', duration))
+            
+            # Show other important messages
+            elif any(keyword in line.lower() for keyword in ['error', 'warning', 'failed']):
+                events.put(('message', line))
+    finally:
+        events.put(('eof',))
+
+
+def _interrupt_requested():
+    """
+    Check whether the user cancelled the running prompt in ComfyUI.
+    """
+    return COMFYUI_AVAILABLE and model_management.processing_interrupted()
+
+
+# Default cap on FFmpeg processes running at the same time across all node instances
+_DEFAULT_MAX_CONCURRENT = max(1, (os.cpu_count() or 2) // 2)
+
+
+class _FFmpegLimiter:
+    """
+    Limits how many FFmpeg processes run at once across all node invocations.
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._active = 0
+    
+    @contextlib.contextmanager
+    def slot(self, limit):
+        """
+        Block until fewer than limit FFmpeg processes are running, then hold a slot.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._active < limit)
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+
+_FFMPEG_LIMITER = _FFmpegLimiter()
+
+
+class _ProbeError(Exception):
+    """
+    Raised by _probe_stream so that failed probes are never stored in the cache.
+    """
+
+
+# Properties of the first video stream; duration is in seconds or None if unknown
+_StreamInfo = namedtuple('_StreamInfo', 'width height codec pix_fmt frame_rate time_base duration')
+
+
+# Probe results are also kept on disk so they survive ComfyUI restarts.
+# (ComfyUI empties its own temp directory on startup, so use the user cache dir.)
+_PROBE_CACHE_PATH = os.path.join(os.path.expanduser('~/.cache/comfyui-ffmpeg-node'), 'probe.json')
+
+
+class _ProbeDiskCache:
+    """
+    JSON file of probe results, one entry per path, valid only while the
+    path's version (file mtime or HTTP validator) and size are unchanged.
+    """
+    
+    def __init__(self, cache_path):
+        self._cache_path = cache_path
+        self._lock = threading.Lock()
+        self._entries = None
+    
+    def _load(self):
+        # Called with the lock held
+        if self._entries is None:
+            try:
+                with open(self._cache_path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+    
+    def get(self, path, version, size):
+        """
+        Return the cached _StreamInfo for path, or None if missing or stale.
+        """
+        with self._lock:
+            entry = self._load().get(path)
+        if not entry or entry.get('version') != version or entry.get('size') != size:
+            return None
+        try:
+            return _StreamInfo(**entry['info'])
+        except (KeyError, TypeError):
+            return None
+    
+    def put(self, path, version, size, info):
+        """
+        Store info for path, replacing any stale entry, and write the file atomically.
+        """
+        with self._lock:
+            entries = self._load()
+            entries[path] = {'version': version, 'size': size, 'info': info._asdict()}
+            self._save(entries)
+    
+    def discard(self, paths):
+        """
+        Remove the entries for paths (e.g. deleted files), writing the file only if any existed.
+        """
+        with self._lock:
+            entries = self._load()
+            removed = [entries.pop(path) for path in paths if path in entries]
+            if removed:
+                self._save(entries)
+    
+    def _save(self, entries):
+        # Called with the lock held
+        try:
+            os.makedirs(os.path.dirname(self._cache_path), exist_ok=True)
+            tmp_path = f"{self._cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self._cache_path)
+        except OSError as e:
+            print(f"[FFmpeg Node] Could not write probe cache {self._cache_path}: {str(e)}")
+
+
+_PROBE_DISK_CACHE = _ProbeDiskCache(_PROBE_CACHE_PATH)
+
+
+# ffprobe options that read only the container header instead of decoding frames
+_FAST_PROBE_ARGS = ['-probesize', '32K', '-analyzeduration', '0', '-fflags', '+fastseek']
+
+
+def _run_ffprobe(path, fast):
+    """
+    Run ffprobe on path and return a _StreamInfo for its first video stream.
+    fast limits probing to the container header (see _FAST_PROBE_ARGS).
+    Raises on failure or when the stream has no usable dimensions.
+    """
+    cmd = [
+        'ffprobe', '-v', 'error', *(_FAST_PROBE_ARGS if fast else []),
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height,codec_name,pix_fmt,r_frame_rate,time_base:format=duration',
+        '-of', 'default=noprint_wrappers=1', path
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    # Output is one "key=value" line per entry
+    fields = dict(line.split(b'=', 1) for line in result.stdout.splitlines() if b'=' in line)
+    try:
+        duration = float(fields.get(b'duration', b''))
+    except ValueError:
+        duration = None
+    info = _StreamInfo(
+        width=int(fields[b'width']),
+        height=int(fields[b'height']),
+        codec=fields.get(b'codec_name', b'').decode(),
+        pix_fmt=fields.get(b'pix_fmt', b'').decode(),
+        frame_rate=fields.get(b'r_frame_rate', b'').decode(),
+        time_base=fields.get(b'time_base', b'').decode(),
+        duration=duration,
+    )
+    if info.width <= 0 or info.height <= 0:
+        raise ValueError("video stream has no dimensions")
+    return info
+
+
+# Timeout for the HEAD request used to validate cached probes of remote URLs
+_HEAD_TIMEOUT = 5
+
+
+def _cache_key(path):
+    """
+    Return (version, size) identifying the current content of path, or None if unknown.
+    Local files use (st_mtime_ns, st_size); HTTP(S) URLs use the ETag (or
+    Last-Modified) and Content-Length headers of a HEAD request.
+    """
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        pass
+    
+    if not path.lower().startswith(('http://', 'https://')):
+        return None
+    try:
+        request = urllib.request.Request(path, method='HEAD')
+        with urllib.request.urlopen(request, timeout=_HEAD_TIMEOUT) as response:
+            headers = response.headers
+    except Exception:
+        return None
+    version = headers.get('ETag') or headers.get('Last-Modified')
+    if not version:
+        # Without a validator we can't tell if the content changed
+        return None
+    return (version, headers.get('Content-Length'))
+
+
+@functools.lru_cache(maxsize=256)
+def _probe_stream(path, version, size):
+    """
+    Run ffprobe on a video and return a _StreamInfo for its first video stream.
+    version and size (see _cache_key) are only part of the cache key, so changed
+    content is re-probed. Results are also looked up in and saved to the on-disk cache.
+    Raises _ProbeError if the stream could not be probed.
+    """
+    if version is not None:
+        info = _PROBE_DISK_CACHE.get(path, version, size)
+        if info is not None:
+            return info
+    
+    try:
+        info = _run_ffprobe(path, fast=True)
+    except Exception:
+        # Some containers need the full stream analysis, retry without the fast-probe limits
+        try:
+            info = _run_ffprobe(path, fast=False)
+        except Exception as e:
+            raise _ProbeError(f"{path}: {str(e)}") from e
+    
+    if version is not None:
+        _PROBE_DISK_CACHE.put(path, version, size, info)
+    return info
+
+
+def _probe_versioned(path, key):
+    """
+    Probe path for the content identified by key (from _cache_key).
+    Bypasses the caches when key is None. Raises _ProbeError on failure.
+    """
+    if key is None:
+        return _probe_stream.__wrapped__(path, None, None)
+    return _probe_stream(path, *key)
+
+
+def _probe_video(path):
+    """
+    Return the _StreamInfo of a video, using the probe caches where the content
+    can be identified (local files and URLs with an ETag/Last-Modified header).
+    Raises _ProbeError on failure.
+    """
+    return _probe_versioned(path, _cache_key(path))
+
+
+# Remote SMART_CONCAT inputs are downloaded once, then probed and encoded from disk.
+# The cache is per user (mode 0700), so other local users can't plant cached inputs.
+_DOWNLOAD_CACHE_DIR = os.path.join(os.path.expanduser('~/.cache/comfyui-ffmpeg-node'), 'downloads')
+
+# Socket timeout for input downloads
+_DOWNLOAD_TIMEOUT = 30
+# Larger inputs are not downloaded, FFmpeg reads them from the URL
+_DOWNLOAD_MAX_BYTES = 4 << 30
+# Least recently used downloads are deleted once the cache grows past this size...
+_DOWNLOAD_CACHE_MAX_BYTES = 10 << 30
+# ...but never ones used within this many seconds (another run may still read them)
+_DOWNLOAD_MIN_AGE = 3600
+
+# File extension of a URL path, kept so the cached file names the same container
+_RE_URL_EXT = re.compile(r'\.[A-Za-z0-9]{1,8}$')
+
+
+def _private_dir(path):
+    """
+    Create directory path (mode 0700) if needed and check that only the current user can use it.
+    Returns False if it is missing, not owned by the user, or accessible to others.
+    """
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.stat(path)
+    except OSError:
+        return False
+    # Ownership and permission bits only mean something on POSIX systems
+    if hasattr(os, 'getuid') and (st.st_uid != os.getuid() or st.st_mode & 0o077):
+        return False
+    return True
+
+
+def _evict_downloads(cache_dir):
+    """
+    Delete the least recently used downloads until the cache fits _DOWNLOAD_CACHE_MAX_BYTES,
+    along with their probe cache entries. Use is tracked by access time (see _ensure_local).
+    """
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith('.part'):
+                    st = entry.stat()
+                    entries.append((st.st_atime, st.st_size, entry.path))
+    except OSError:
+        return
+    
+    total = sum(size for _, size, _ in entries)
+    cutoff = time.time() - _DOWNLOAD_MIN_AGE
+    evicted = []
+    for atime, size, path in sorted(entries):
+        if total <= _DOWNLOAD_CACHE_MAX_BYTES or atime > cutoff:
+            break
+        with contextlib.suppress(OSError):
+            os.remove(path)
+            total -= size
+            evicted.append(path)
+    if evicted:
+        _PROBE_DISK_CACHE.discard(evicted)
+
+
+def _ensure_local(url):
+    """
+    Download an HTTP(S) URL into the input cache and return the local path.
+    Files are named after the URL and its ETag/Last-Modified validator (see _cache_key),
+    so unchanged content is downloaded only once. A cache hit marks the file as recently
+    used through its access time; the mtime is kept, as it is part of the probe cache key.
+    Returns url unchanged if it is not an HTTP(S) URL, has no validator, is larger than
+    _DOWNLOAD_MAX_BYTES, or the download failed.
+    """
+    if not url.lower().startswith(('http://', 'https://')):
+        return url
+    
+    key = _cache_key(url)
+    if key is None:
+        # Without a validator a cached copy could be stale, let FFmpeg read the URL
+        return url
+    if not _private_dir(_DOWNLOAD_CACHE_DIR):
+        print(f"[FFmpeg Node] Download cache {_DOWNLOAD_CACHE_DIR} is not private to this user, not caching {url}")
+        return url
+    
+    ext_match = _RE_URL_EXT.search(urllib.parse.urlsplit(url).path)
+    ext = ext_match.group(0).lower() if ext_match else ''
+    digest = hashlib.sha1(f"{url}\n{key}".encode('utf-8')).hexdigest()
+    local_path = os.path.join(_DOWNLOAD_CACHE_DIR, f"{digest}{ext}")
+    try:
+        st = os.stat(local_path)
+    except OSError:
+        st = None
+    if st is not None:
+        with contextlib.suppress(OSError):
+            os.utime(local_path, ns=(time.time_ns(), st.st_mtime_ns))
+        print(f"[FFmpeg Node] Using cached download of {url}")
+        return local_path
+    
+    # Download to a unique name first so concurrent runs never see a partial file
+    tmp_path = f"{local_path}.{uuid.uuid4().hex}.part"
+    try:
+        with urllib.request.urlopen(url, timeout=_DOWNLOAD_TIMEOUT) as response:
+            length = response.headers.get('Content-Length', '')
+            if length.isdigit() and int(length) > _DOWNLOAD_MAX_BYTES:
+                raise ValueError(f"file is larger than {_DOWNLOAD_MAX_BYTES} bytes")
+            with open(tmp_path, 'wb') as f:
+                copied = 0
+                for chunk in iter(lambda: response.read(_READ_CHUNK_SIZE), b''):
+                    copied += len(chunk)
+                    if copied > _DOWNLOAD_MAX_BYTES:
+                        raise ValueError(f"file is larger than {_DOWNLOAD_MAX_BYTES} bytes")
+                    f.write(chunk)
+        os.replace(tmp_path, local_path)
+    except Exception as e:
+        print(f"[FFmpeg Node] Could not download {url}, FFmpeg will read it directly: {str(e)}")
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        return url
+    
+    print(f"[FFmpeg Node] Downloaded {url} to {local_path}")
+    _evict_downloads(_DOWNLOAD_CACHE_DIR)
+    return local_path
+
+
+def _can_stream_copy(info1, info2, target_w, target_h, trims):
+    """
+    Check whether two inputs can be joined with the concat demuxer and -c copy.
+    Both streams must already have the target resolution, share codec, pixel format,
+    frame rate and time base, and the trims must keep each clip whole.
+    """
+    trim1_start, trim1_end, trim2_start, trim2_end = trims
+    if (info1.width, info1.height) != (target_w, target_h):
+        return False
+    if info1[:6] != info2[:6] or not info1.codec:
+        return False
+    if info1.duration is None or info2.duration is None:
+        return False
+    return (trim1_start <= 0 and trim1_end >= info1.duration
+            and trim2_start <= 0 and trim2_end >= info2.duration)
+
+
+def _write_concat_list(list_path, paths):
+    """
+    Write an FFmpeg concat demuxer list file referencing paths.
+    """
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in paths:
+            # Single quotes are escaped as '\'' in concat list entries
+            escaped = path.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+
+# H.264 encoders SMART_CONCAT can use; "auto" picks the fastest one available
+_ENCODER_CHOICES = ["auto", "libx264", "h264_nvenc", "h264_vaapi", "h264_videotoolbox"]
+_VAAPI_DEVICE = '/dev/dri/renderD128'
+
+
+# Encoders and hardware decoding methods built into the local ffmpeg
+_FFmpegCaps = namedtuple('_FFmpegCaps', 'encoders hwaccels')
+
+
+def _run_ffmpeg_listing(option):
+    """
+    Run an ffmpeg listing option (e.g. -encoders) and return its output, or "" if that fails.
+    """
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', option], capture_output=True, text=True, check=True)
+    except Exception as e:
+        print(f"[FFmpeg Node] Could not run ffmpeg {option}: {str(e)}")
+        return ""
+    return result.stdout
+
+
+@functools.lru_cache(maxsize=None)
+def _probe_ffmpeg_caps():
+    """
+    Return the _FFmpegCaps of the local ffmpeg as frozensets of names.
+    ffmpeg is queried on first use and only once per process (so importing the node
+    never runs it); the sets are empty if ffmpeg could not be run.
+    """
+    # Encoder lines follow the " ------" separator, e.g. " V....D libx264   libx264 H.264 ..."
+    _, _, listing = _run_ffmpeg_listing('-encoders').partition('------')
+    encoders = frozenset(parts[1] for parts in map(str.split, listing.splitlines()) if len(parts) >= 2)
+    
+    # "Hardware acceleration methods:" followed by one method per line
+    _, _, listing = _run_ffmpeg_listing('-hwaccels').partition(':')
+    hwaccels = frozenset(listing.split())
+    
+    return _FFmpegCaps(encoders, hwaccels)
+
+
+# Hardware decoder paired with each hardware encoder, so decoding leaves the CPU too
+_ENCODER_HWACCELS = {
+    'h264_nvenc': 'cuda',
+    'h264_vaapi': 'vaapi',
+    'h264_videotoolbox': 'videotoolbox',
+}
+
+
+# Timeout for the test encode that checks a hardware encoder works
+_ENCODER_TEST_TIMEOUT = 15
+
+
+@functools.lru_cache(maxsize=None)
+def _encoder_works(encoder):
+    """
+    Check with a 1-frame test encode that a hardware encoder runs on this machine.
+    ffmpeg builds often list encoders whose GPU or driver is missing (e.g. h264_nvenc
+    in every Windows build), so being listed is not enough.
+    Each encoder is tested at most once per process.
+    """
+    device_args = []
+    upload_args = []
+    if encoder == 'h264_vaapi':
+        device_args = ['-vaapi_device', _VAAPI_DEVICE]
+        upload_args = ['-vf', 'format=nv12,hwupload']
+    # 256x256 stays above the minimum frame size of NVENC and VideoToolbox
+    cmd = [
+        'ffmpeg', '-hide_banner', '-v', 'error', *device_args,
+        '-f', 'lavfi', '-i', 'color=s=256x256',
+        '-frames:v', '1', *upload_args, '-c:v', encoder, '-f', 'null', '-'
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, timeout=_ENCODER_TEST_TIMEOUT, check=True)
+    except Exception as e:
+        print(f"[FFmpeg Node] Encoder {encoder} is not usable, skipping it: {str(e)}")
+        return False
+    return True
+
+
+def _select_encoder(requested):
+    """
+    Resolve the encoder to use. "auto" picks a hardware H.264 encoder if one is
+    built into ffmpeg and passes a test encode, otherwise libx264.
+    """
+    if requested and requested != "auto":
+        return requested
+    
+    encoders = _probe_ffmpeg_caps().encoders
+    candidates = []
+    if 'h264_nvenc' in encoders and (not sys.platform.startswith('linux') or os.path.exists('/dev/nvidia0')):
+        candidates.append('h264_nvenc')
+    if 'h264_vaapi' in encoders and sys.platform.startswith('linux') and os.path.exists(_VAAPI_DEVICE):
+        candidates.append('h264_vaapi')
+    if 'h264_videotoolbox' in encoders and sys.platform == 'darwin':
+        candidates.append('h264_videotoolbox')
+    return next((encoder for encoder in candidates if _encoder_works(encoder)), 'libx264')
+
+
+# x264 gains little past ~8 threads, more just thrash the cache
+_X264_MAX_THREADS = 8
+# Extra libx264 options for speed_mode: short lookahead and sliced threads for low latency
+_X264_SPEED_ARGS = ['-tune', 'fastdecode', '-x264-params', 'sliced_threads=1:lookahead_threads=1:rc_lookahead=10']
+
+
+def _x264_threads(concurrent_encodes):
+    """
+    Return the libx264 thread count for one encode, so that concurrent_encodes encodes
+    running together use about one thread per CPU core. A single encode gets
+    min(_X264_MAX_THREADS, cpu_count).
+    """
+    return max(1, min(_X264_MAX_THREADS, (os.cpu_count() or 1) // concurrent_encodes))
+
+
+def _encoder_args(encoder, crf, preset, speed_mode=False, threads=None):
+    """
+    Return the output encoding arguments for encoder, mapping crf to its quality setting.
+    speed_mode makes libx264 use the ultrafast preset and low-latency options.
+    threads is libx264's thread count (default: as if it ran alone, see _x264_threads).
+    """
+    if encoder == 'h264_nvenc':
+        # NVENC's constant quality runs slightly better than x264 at the same value
+        return ['-c:v', 'h264_nvenc', '-preset', 'p5', '-cq', str(crf + 1), '-b:v', '0']
+    if encoder == 'h264_vaapi':
+        return ['-c:v', 'h264_vaapi', '-qp', str(crf)]
+    if encoder == 'h264_videotoolbox':
+        # VideoToolbox quality is 1-100 (higher is better), roughly mirror the CRF scale
+        return ['-c:v', 'h264_videotoolbox', '-q:v', str(max(1, min(100, 100 - 2 * crf)))]
+    threads = threads or _x264_threads(1)
+    args = ['-c:v', 'libx264', '-crf', str(crf), '-threads', str(threads)]
+    if speed_mode:
+        return args + ['-preset', 'ultrafast', *_X264_SPEED_ARGS]
+    return args + ['-preset', preset]
+
+
+# Filter chains for one SMART_CONCAT input. The output resolution is always one of a
+# few fixed targets and there are only two inputs, so every chain is rendered ahead of time.
+_SMART_CONCAT_TARGETS = ((1920, 1080), (1080, 1920), (1080, 1080))
+# Trimming is done by seeking the input (-ss/-t), the filters only reset timestamps
+_TRIM_FILTERS = tuple(f"[{idx}:v]setpts=PTS-STARTPTS[v{idx}]" for idx in (0, 1))
+# Scale to cover the target keeping the aspect ratio, then center-crop (crop's default offset)
+_CROP_FILTERS = {
+    (tw, th, idx): f"[{idx}:v]setpts=PTS-STARTPTS,scale={tw}:{th}:force_original_aspect_ratio=increase,crop={tw}:{th}[v{idx}]"
+    for tw, th in _SMART_CONCAT_TARGETS
+    for idx in (0, 1)
+}
+_CONCAT_FILTER = "[v0][v1]concat=n=2:v=1:a=0[outv]"
+
+
+def _get_crop_filter(w, h, target_w, target_h, input_idx):
+    """
+    Build the scale/crop filter chain for one SMART_CONCAT input.
+    """
+    # Input already has the target resolution - no need to scale or crop
+    if w == target_w and h == target_h:
+        return _TRIM_FILTERS[input_idx]
+    
+    return _CROP_FILTERS[(target_w, target_h, input_idx)]
+
+
+@functools.lru_cache(maxsize=64)
+def _determine(path1, key1, path2, key2, trims):
+    """
+    Probe both inputs and compute the SMART_CONCAT output resolution and filter complex.
+    key1/key2 are the inputs' _cache_key values (None bypasses the probe caches).
+    trims is (trim1_start, trim1_end, trim2_start, trim2_end).
+    Returns (target_w, target_h, filter_complex, stream_copy) where stream_copy tells
+    whether the inputs can be joined without re-encoding. Raises _ProbeError on failure.
+    """
+    # Get dimensions of both videos (probed concurrently, ffprobe is I/O bound)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future1 = executor.submit(_probe_versioned, path1, key1)
+        future2 = executor.submit(_probe_versioned, path2, key2)
+        info1, info2 = future1.result(), future2.result()
+    
+    w1, h1 = info1.width, info1.height
+    w2, h2 = info2.width, info2.height
+    
+    # Determine aspect ratio categories
+    # Landscape: width > height (e.g., 1920x1080)
+    # Portrait: height > width (e.g., 1080x1920) 
+    # Square: width == height (e.g., 1080x1080)
+    
+    is_landscape_1 = w1 > h1
+    is_portrait_1 = h1 > w1
+    is_square_1 = w1 == h1
+    
+    is_landscape_2 = w2 > h2
+    is_portrait_2 = h2 > w2
+    is_square_2 = w2 == h2
+    
+    # Determine output resolution based on user's requirements
+    if (is_landscape_1 or is_square_1) and (is_landscape_2 or is_square_2):
+        # Both are landscape/square -> output landscape 1920x1080
+        target_w, target_h = 1920, 1080
+    elif (is_portrait_1 or is_square_1) and (is_portrait_2 or is_square_2):
+        # Both are portrait/square -> output portrait 1080x1920
+        target_w, target_h = 1080, 1920
+    else:
+        # One landscape, one portrait -> output square 1080x1080
+        target_w, target_h = 1080, 1080
+    
+    # Generate filter complex
+    filter1 = _get_crop_filter(w1, h1, target_w, target_h, 0)
+    filter2 = _get_crop_filter(w2, h2, target_w, target_h, 1)
+    
+    filter_complex = ";".join((filter1, filter2, _CONCAT_FILTER))
+    
+    print(f"[FFmpeg Node] Video 1: {w1}x{h1}, Video 2: {w2}x{h2}")
+    print(f"[FFmpeg Node] Target resolution: {target_w}x{target_h}")
+    print(f"[FFmpeg Node] Filter complex: {filter_complex}")
+    
+    stream_copy = _can_stream_copy(info1, info2, target_w, target_h, trims)
+    
+    return (target_w, target_h, filter_complex, stream_copy)
+
+
+# Node inputs, built once; ComfyUI only reads this
+_INPUT_TYPES = {
+    "required": {
+        "input_mp4_1": ("STRING", {"default": "", "multiline": False, "placeholder": "URL to first MP4 file (e.g., https://example.com/video1.mp4)"}),
+        "input_mp4_2": ("STRING", {"default": "", "multiline": False, "placeholder": "URL to second MP4 file (optional, e.g., https://example.com/video2.mp4)"}),
+        "output_path": ("STRING", {"default": "", "multiline": False, "placeholder": "Complete output file path (e.g., /path/to/output.mp4)"}),
+        "video_length": ("FLOAT", {"default": 4.0, "min": 0.1, "max": 60.0, "step": 0.1, "display": "number"}),
+        "trim_start": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 30.0, "step": 0.1, "display": "number"}),
+        "trim_end": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 30.0, "step": 0.1, "display": "number"}),
+        "ffmpeg_command": ("STRING", {
+            "default": "SMART_CONCAT",
+            "multiline": True,
+            "placeholder": "FFmpeg command. Use SMART_CONCAT for intelligent aspect ratio detection and cropping, or custom commands with {inputs}/{input1}/{input2} and {output}."
+        }),
+        "execute": ("BOOLEAN", {"default": True}),
+    },
+    "optional": {
+        "max_concurrent": ("INT", {"default": _DEFAULT_MAX_CONCURRENT, "min": 1, "max": 64, "step": 1, "display": "number"}),
+        "encoder": (_ENCODER_CHOICES, {"default": "auto"}),
+        "speed_mode": ("BOOLEAN", {"default": False}),
+        "cache_inputs": ("BOOLEAN", {"default": True}),
+    }
+}
+
 
 class FFmpegNode:
     """
@@ -23,22 +835,7 @@ class FFmpegNode:
     
     @classmethod
     def INPUT_TYPES(s):
-        return {
-            "required": {
-                "input_mp4_1": ("STRING", {"default": "", "multiline": False, "placeholder": "URL to first MP4 file (e.g., https://example.com/video1.mp4)"}),
-                "input_mp4_2": ("STRING", {"default": "", "multiline": False, "placeholder": "URL to second MP4 file (optional, e.g., https://example.com/video2.mp4)"}),
-                "output_path": ("STRING", {"default": "", "multiline": False, "placeholder": "Complete output file path (e.g., /path/to/output.mp4)"}),
-                "video_length": ("FLOAT", {"default": 4.0, "min": 0.1, "max": 60.0, "step": 0.1, "display": "number"}),
-                "trim_start": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 30.0, "step": 0.1, "display": "number"}),
-                "trim_end": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 30.0, "step": 0.1, "display": "number"}),
-                "ffmpeg_command": ("STRING", {
-                    "default": "SMART_CONCAT",
-                    "multiline": True,
-                    "placeholder": "FFmpeg command. Use SMART_CONCAT for intelligent aspect ratio detection and cropping, or custom commands with {inputs}/{input1}/{input2} and {output}."
-                }),
-                "execute": ("BOOLEAN", {"default": True}),
-            }
-        }
+        return _INPUT_TYPES
     
     RETURN_TYPES = ("STRING", "STRING")
     RETURN_NAMES = ("status_message", "output_file_path")
@@ -48,21 +845,12 @@ class FFmpegNode:
     def get_video_dimensions(self, video_path):
         """
         Get video dimensions using ffprobe.
+        Results are cached while the file (mtime, size) or URL (ETag/Last-Modified) is unchanged.
         Returns (width, height) or None if failed.
         """
         try:
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-print_format', 'json',
-                '-show_streams', '-select_streams', 'v:0', video_path
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            data = json.loads(result.stdout)
-            
-            if 'streams' in data and len(data['streams']) > 0:
-                stream = data['streams'][0]
-                width = int(stream.get('width', 0))
-                height = int(stream.get('height', 0))
-                return (width, height)
+            info = _probe_video(video_path)
+            return (info.width, info.height)
         except Exception as e:
             print(f"[FFmpeg Node] Error getting video dimensions for {video_path}: {str(e)}")
         return None
@@ -72,11 +860,7 @@ class FFmpegNode:
         Check if the provided string is a valid URL.
         Returns True for valid HTTP/HTTPS URLs, False otherwise.
         """
-        try:
-            result = urlparse(url.strip())
-            return all([result.scheme, result.netloc]) and result.scheme in ['http', 'https']
-        except Exception:
-            return False
+        return _RE_URL.fullmatch(url.strip()) is not None
     
     def validate_url_input(self, url, input_name):
         """
@@ -91,87 +875,98 @@ class FFmpegNode:
         
         return None
     
+    def _analyze_inputs(self, input1_path, input2_path, trims):
+        """
+        Run the (cached) SMART_CONCAT analysis for two inputs.
+        Returns (target_w, target_h, filter_complex, stream_copy) or None if failed.
+        """
+        try:
+            # Identify both inputs' content concurrently (HEAD requests for URLs)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                key1, key2 = executor.map(_cache_key, (input1_path, input2_path))
+            if key1 is None or key2 is None:
+                # Content can't be identified - analyze without caching the result
+                return _determine.__wrapped__(input1_path, key1, input2_path, key2, trims)
+            return _determine(input1_path, key1, input2_path, key2, trims)
+        except _ProbeError as e:
+            print(f"[FFmpeg Node] Error getting video dimensions for {str(e)}")
+        return None
+    
     def determine_output_resolution_and_crop(self, input1_path, input2_path, trim1_start=0.5, trim1_end=4.5, trim2_start=0.5, trim2_end=7.5):
         """
         Analyze input videos and determine the best output resolution and crop filters.
+        Results are cached by input content (see get_video_dimensions) and trim times.
         Returns (resolution_width, resolution_height, filter_complex) or None if failed.
         """
-        # Get dimensions of both videos
-        dims1 = self.get_video_dimensions(input1_path)
-        dims2 = self.get_video_dimensions(input2_path)
-        
-        if not dims1 or not dims2:
-            return None
-        
-        w1, h1 = dims1
-        w2, h2 = dims2
-        
-        # Determine aspect ratio categories
-        # Landscape: width > height (e.g., 1920x1080)
-        # Portrait: height > width (e.g., 1080x1920) 
-        # Square: width == height (e.g., 1080x1080)
-        
-        is_landscape_1 = w1 > h1
-        is_portrait_1 = h1 > w1
-        is_square_1 = w1 == h1
-        
-        is_landscape_2 = w2 > h2
-        is_portrait_2 = h2 > w2
-        is_square_2 = w2 == h2
-        
-        # Determine output resolution based on user's requirements
-        if (is_landscape_1 or is_square_1) and (is_landscape_2 or is_square_2):
-            # Both are landscape/square -> output landscape 1920x1080
-            target_w, target_h = 1920, 1080
-        elif (is_portrait_1 or is_square_1) and (is_portrait_2 or is_square_2):
-            # Both are portrait/square -> output portrait 1080x1920
-            target_w, target_h = 1080, 1920
-        else:
-            # One landscape, one portrait -> output square 1080x1080
-            target_w, target_h = 1080, 1080
-        
-        # Generate crop filters for each input
-        def get_crop_filter(w, h, target_w, target_h, input_idx, trim_start, trim_end):
-            # Calculate scale factor to fit the smaller dimension
-            scale_factor = max(target_w / w, target_h / h)
-            scaled_w = int(w * scale_factor)
-            scaled_h = int(h * scale_factor)
-            
-            # Calculate crop offsets to center the crop
-            crop_x = max(0, (scaled_w - target_w) // 2)
-            crop_y = max(0, (scaled_h - target_h) // 2)
-            
-            return f"[{input_idx}:v]trim=start={trim_start}:end={trim_end},setpts=PTS-STARTPTS,scale={scaled_w}:{scaled_h},crop={target_w}:{target_h}:{crop_x}:{crop_y}[v{input_idx}]"
-        
-        # Generate filter complex
-        filter1 = get_crop_filter(w1, h1, target_w, target_h, 0, trim1_start, trim1_end)
-        filter2 = get_crop_filter(w2, h2, target_w, target_h, 1, trim2_start, trim2_end)
-        
-        filter_complex = f'"{filter1};{filter2};[v0][v1]concat=n=2:v=1:a=0[outv]"'
-        
-        print(f"[FFmpeg Node] Video 1: {w1}x{h1}, Video 2: {w2}x{h2}")
-        print(f"[FFmpeg Node] Target resolution: {target_w}x{target_h}")
-        print(f"[FFmpeg Node] Filter complex: {filter_complex}")
-        
-        return (target_w, target_h, filter_complex)
+        result = self._analyze_inputs(input1_path, input2_path, (trim1_start, trim1_end, trim2_start, trim2_end))
+        return result[:3] if result else None
     
-    def create_smart_concat_command(self, input1_path, input2_path, output_path, trim1_start=0.5, trim1_end=4.5, trim2_start=0.5, trim2_end=4.5, crf=19, preset="veryfast"):
+    def create_smart_concat_command(self, input1_path, input2_path, output_path, trim1_start=0.5, trim1_end=4.5, trim2_start=0.5, trim2_end=4.5, crf=19, preset="veryfast", concat_list_path=None, encoder="auto", speed_mode=False, threads=None):
         """
         Create a smart concat command that automatically detects aspect ratios and applies appropriate cropping.
+        encoder is one of _ENCODER_CHOICES; "auto" uses a hardware encoder when available.
+        speed_mode trades quality for encoding speed (libx264 only).
+        threads caps libx264's threads (see _x264_threads).
+        If concat_list_path is given and both inputs can be joined without re-encoding,
+        a concat demuxer list is written there and a stream copy command is returned instead.
+        Returns the command as an argv list, or None if the inputs could not be analyzed.
         """
-        result = self.determine_output_resolution_and_crop(input1_path, input2_path, trim1_start, trim1_end, trim2_start, trim2_end)
+        result = self._analyze_inputs(input1_path, input2_path, (trim1_start, trim1_end, trim2_start, trim2_end))
         if not result:
             return None
         
-        target_w, target_h, filter_complex = result
+        target_w, target_h, filter_complex, stream_copy = result
+        
+        if stream_copy and concat_list_path:
+            print("[FFmpeg Node] Inputs already match in resolution and format, using stream copy")
+            _write_concat_list(concat_list_path, [input1_path, input2_path])
+            return [
+                'ffmpeg', '-f', 'concat', '-safe', '0',
+                '-protocol_whitelist', 'file,http,https,tcp,tls',
+                '-i', concat_list_path, '-y',
+                '-map', '0:v', '-an', '-c', 'copy',
+                # Put the moov atom first so the joined file is ready for web playback
+                '-movflags', '+faststart',
+                output_path
+            ]
+        
+        encoder = _select_encoder(encoder)
+        print(f"[FFmpeg Node] Using encoder: {encoder}")
+        
+        device_args = []
+        input_args = []
+        hwaccel = _ENCODER_HWACCELS.get(encoder)
+        if hwaccel and hwaccel in _probe_ffmpeg_caps().hwaccels:
+            # Decode on the same device; frames are downloaded for the CPU filters
+            # (ffmpeg falls back to software decoding if the codec isn't supported)
+            input_args = ['-hwaccel', hwaccel]
+        if encoder == 'h264_vaapi':
+            # VAAPI encodes from GPU surfaces, so upload the filtered frames first
+            device_args = ['-vaapi_device', _VAAPI_DEVICE]
+            filter_complex = filter_complex.replace('[outv]', '[outsw];[outsw]format=nv12,hwupload[outv]')
         
-        command = f'ffmpeg -i "{input1_path}" -i "{input2_path}" -y -filter_complex {filter_complex} -map "[outv]" -an -c:v libx264 -crf {crf} -preset {preset} "{output_path}"'
+        # Seek each input before opening it so the demuxer jumps straight to the
+        # trim start instead of decoding and discarding everything before it
+        seek1 = ['-ss', str(trim1_start), '-t', str(round(trim1_end - trim1_start, 6))]
+        seek2 = ['-ss', str(trim2_start), '-t', str(round(trim2_end - trim2_start, 6))]
+        
+        command = [
+            'ffmpeg', *device_args,
+            *input_args, *seek1, '-i', input1_path,
+            *input_args, *seek2, '-i', input2_path, '-y',
+            '-filter_complex', filter_complex,
+            '-map', '[outv]', '-an',
+            *_encoder_args(encoder, crf, preset, speed_mode, threads),
+            output_path
+        ]
         
         return command
     
-    def run_ffmpeg(self, input_mp4_1, input_mp4_2, output_path, video_length, trim_start, trim_end, ffmpeg_command, execute):
+    def run_ffmpeg(self, input_mp4_1, input_mp4_2, output_path, video_length, trim_start, trim_end, ffmpeg_command, execute, max_concurrent=None, encoder=None, speed_mode=None, cache_inputs=None, concurrent_jobs=1):
         """
         Execute the FFmpeg command with the provided inputs.
+        concurrent_jobs is how many jobs run alongside this one (set by run_ffmpeg_batch),
+        used to share the CPU cores between their libx264 encodes.
         """
         # Handle None value for execute parameter
         execute = execute if execute is not None else True
@@ -179,73 +974,64 @@ class FFmpegNode:
         if not execute:
             return ("FFmpeg execution skipped", "")
         
-        # Validate inputs - return error messages instead of raising exceptions
-        # Handle None values safely
-        input_mp4_1 = input_mp4_1 or ""
-        input_mp4_2 = input_mp4_2 or ""
+        # Handle None values safely and strip each input once
+        input_mp4_1 = (input_mp4_1 or "").strip()
+        input_mp4_2 = (input_mp4_2 or "").strip()
         output_path = output_path or ""
-        ffmpeg_command = ffmpeg_command or ""
-        
-        if not input_mp4_1.strip():
-            return ("ERROR: At least one input MP4 URL is required", "")
-        
-        if not output_path.strip():
-            return ("ERROR: Output path is required", "")
+        ffmpeg_command = (ffmpeg_command or "").strip()
+        has_input2 = bool(input_mp4_2)
         
-        if not ffmpeg_command.strip():
-            return ("ERROR: FFmpeg command is required", "")
-        
-        # Validate timing parameters - handle None values
+        # Timing and encoding parameters - handle None values
         video_length = video_length if video_length is not None else 4.0
         trim_start = trim_start if trim_start is not None else 0.5
         trim_end = trim_end if trim_end is not None else 0.5
+        max_concurrent = max_concurrent if max_concurrent is not None else _DEFAULT_MAX_CONCURRENT
+        encoder = encoder or "auto"
+        speed_mode = bool(speed_mode)
+        cache_inputs = cache_inputs if cache_inputs is not None else True
         
-        if video_length <= 0:
-            return ("ERROR: Video length must be greater than 0", "")
-        
-        if trim_start < 0:
-            return ("ERROR: Trim start cannot be negative", "")
-        
-        if trim_end < 0:
-            return ("ERROR: Trim end cannot be negative", "")
-        
-        if trim_start + video_length > 3600:  # 1 hour safety limit
-            return ("ERROR: Trim start + video length cannot exceed 1 hour", "")
-        
-        # Ensure output_path has a filename (not just a directory)
-        if os.path.isdir(output_path) or output_path.endswith('/') or output_path.endswith('\\'):
-            return ("ERROR: Output path must include a filename (e.g., /path/to/output.mp4)", "")
+        # Validate inputs - return the first failed check's message instead of raising exceptions
+        checks = (
+            (not input_mp4_1, "ERROR: At least one input MP4 URL is required"),
+            (not output_path.strip(), "ERROR: Output path is required"),
+            (not ffmpeg_command, "ERROR: FFmpeg command is required"),
+            (video_length <= 0, "ERROR: Video length must be greater than 0"),
+            (trim_start < 0, "ERROR: Trim start cannot be negative"),
+            (trim_end < 0, "ERROR: Trim end cannot be negative"),
+            (trim_start + video_length > 3600, "ERROR: Trim start + video length cannot exceed 1 hour"),  # 1 hour safety limit
+            (max_concurrent < 1, "ERROR: Max concurrent must be at least 1"),
+            (encoder not in _ENCODER_CHOICES, f"ERROR: Unknown encoder '{encoder}'. Choose one of: {', '.join(_ENCODER_CHOICES)}"),
+            # Ensure output_path has a filename (not just a directory)
+            (output_path.endswith(('/', '\\')) or os.path.isdir(output_path), "ERROR: Output path must include a filename (e.g., /path/to/output.mp4)"),
+        )
+        error = next((message for failed, message in checks if failed), None)
         
         # Validate URL inputs
-        url_error = self.validate_url_input(input_mp4_1, "First input URL")
-        if url_error:
-            return (url_error, "")
-        
-        if input_mp4_2.strip():
-            url_error = self.validate_url_input(input_mp4_2, "Second input URL")
-            if url_error:
-                return (url_error, "")
+        if not error:
+            error = self.validate_url_input(input_mp4_1, "First input URL")
+        if not error and has_input2:
+            error = self.validate_url_input(input_mp4_2, "Second input URL")
+        if error:
+            return (error, "")
         
         # Prepare input URLs list
-        input_files = []
-        if input_mp4_1.strip():
-            input_files.append(input_mp4_1.strip())
-        if input_mp4_2.strip():
-            input_files.append(input_mp4_2.strip())
+        input_files = [input_mp4_1, input_mp4_2] if has_input2 else [input_mp4_1]
+        
+        # Scan the command once for input references and the SMART_CONCAT keyword
+        command_tokens = {token.lower() for token in _RE_CMD_SCAN.findall(ffmpeg_command)}
         
         # Validate filter_complex usage
-        if "[1:v]" in ffmpeg_command and len(input_files) < 2:
+        if "[1:v]" in command_tokens and len(input_files) < 2:
             return (f"ERROR: Command references [1:v] (second input) but only {len(input_files)} input URL(s) provided", "")
-        if "[1:a]" in ffmpeg_command and len(input_files) < 2:
+        if "[1:a]" in command_tokens and len(input_files) < 2:
             return (f"ERROR: Command references [1:a] (second input audio) but only {len(input_files)} input URL(s) provided", "")
         
         # Check for unsupported third input references
-        if any(ref in ffmpeg_command for ref in ["[2:v]", "[2:a]", "{input3}"]):
+        if command_tokens & {"[2:v]", "[2:a]", "{input3}"}:
             return ("ERROR: This node only supports 2 inputs. Third input references ([2:v], [2:a], {input3}) are not supported", "")
         
         # Add unique timestamp to output filename
-        output_dir = os.path.dirname(output_path)
-        output_filename = os.path.basename(output_path)
+        output_dir, output_filename = os.path.split(output_path)
         
         # Split filename and extension
         if '.' in output_filename:
@@ -255,7 +1041,7 @@ class FFmpegNode:
             ext_part = '.mp4'  # Default extension if none provided
         
         # Generate timestamp (YYYYMMDD_HHMMSS)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
         
         # Create new filename with timestamp
         timestamped_filename = f"{name_part}_{timestamp}{ext_part}"
@@ -263,8 +1049,12 @@ class FFmpegNode:
         
         print(f"[FFmpeg Node] Output filename with timestamp: {output_path}")
         
+        concat_list_path = None
+        smart_fallback = None
+        output_duration = None
+        
         # Check for smart concat command
-        if "SMART_CONCAT" in ffmpeg_command.upper():
+        if "smart_concat" in command_tokens:
             if len(input_files) != 2:
                 return ("ERROR: SMART_CONCAT requires exactly 2 input URLs", "")
             
@@ -279,133 +1069,208 @@ class FFmpegNode:
             crf = 18
             preset = "veryfast"
             
-            # Look for encoding parameters in the command (optional overrides)
-            import re
-            crf_match = re.search(r'crf=(\d+)', ffmpeg_command)
-            if crf_match:
-                crf = int(crf_match.group(1))
+            # Look for trim/encoding parameters in the command (optional overrides)
+            hints = _parse_hints(ffmpeg_command)
             
-            preset_match = re.search(r'preset=(\w+)', ffmpeg_command)
-            if preset_match:
-                preset = preset_match.group(1)
+            if 't1s' in hints:
+                trim1_start, trim1_end = float(hints['t1s']), float(hints['t1e'])
+            if 't2s' in hints:
+                trim2_start, trim2_end = float(hints['t2s']), float(hints['t2e'])
+            if 'crf' in hints:
+                crf = int(hints['crf'])
+            if 'preset' in hints:
+                preset = hints['preset']
             
             print(f"[FFmpeg Node] Using timing - Start: {trim_start}s, Length: {video_length}s, End trim: {trim_end}s")
             print(f"[FFmpeg Node] Calculated trim times - Video1: {trim1_start}-{trim1_end}s, Video2: {trim2_start}-{trim2_end}s")
             
+            # The output is both trimmed clips, so progress is measured against their total
+            output_duration = (trim1_end - trim1_start) + (trim2_end - trim2_start)
+            
+            if cache_inputs:
+                # Download both inputs in parallel so ffprobe and ffmpeg read local files
+                # instead of each fetching the URLs over the network
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    input_files = list(executor.map(_ensure_local, input_files))
+            
             # Generate the smart concat command
-            smart_command = self.create_smart_concat_command(
+            # (the concat list is only written if the inputs can be stream copied)
+            concat_list_path = os.path.join(tempfile.gettempdir(), f"ffmpeg_node_concat_{uuid.uuid4().hex}.txt")
+            build_smart_command = functools.partial(
+                self.create_smart_concat_command,
                 input_files[0], input_files[1], output_path,
-                trim1_start, trim1_end, trim2_start, trim2_end, crf, preset
+                trim1_start, trim1_end, trim2_start, trim2_end, crf, preset,
+                concat_list_path=concat_list_path, speed_mode=speed_mode,
+                # Split the cores between the encodes actually running at the same time
+                # (max_concurrent is only a ceiling, a single run keeps all its threads)
+                threads=_x264_threads(max(1, min(concurrent_jobs, max_concurrent)))
             )
+            encoder = _select_encoder(encoder)
+            smart_command = build_smart_command(encoder=encoder)
             
             if not smart_command:
                 return ("ERROR: Failed to analyze video dimensions for smart concat", "")
             
             command = smart_command
+            if encoder != 'libx264':
+                # Hardware encoding can still fail on a particular input or driver
+                smart_fallback = functools.partial(build_smart_command, encoder='libx264')
         else:
-            # Prepare the command by replacing placeholders
-            command = ffmpeg_command
+            # Split the command template first, then substitute placeholders per token,
+            # so input and output paths are never re-parsed (backslashes, quotes)
+            try:
+                template = _split_command(ffmpeg_command)
+            except ValueError as e:
+                return (f"ERROR: Could not parse FFmpeg command: {str(e)}", "")
             
             # Build input parameters automatically
-            input_params = ""
-            for i, input_file in enumerate(input_files):
-                input_params += f'-i "{input_file}" '
+            input_argv = [arg for input_file in input_files for arg in ('-i', input_file)]
             
-            # Replace input placeholders
-            if len(input_files) >= 1:
-                command = command.replace("{input1}", f'"{input_files[0]}"')
-            if len(input_files) >= 2:
-                command = command.replace("{input2}", f'"{input_files[1]}"')
-            
-            # Replace special {inputs} placeholder with all input parameters
-            command = command.replace("{inputs}", input_params.strip())
+            # Replace placeholders (skipped entirely when the command has none)
+            command = template
+            if '{' in ffmpeg_command:
+                replacements = {"{input1}": input_files[0], "{output}": output_path}
+                if len(input_files) >= 2:
+                    replacements["{input2}"] = input_files[1]
+                
+                command = []
+                for token in template:
+                    # Special {inputs} placeholder expands to all input parameters
+                    if token == "{inputs}":
+                        command.extend(input_argv)
+                        continue
+                    if '{' in token:
+                        for placeholder, value in replacements.items():
+                            token = token.replace(placeholder, value)
+                    command.append(token)
             
-            # Replace output placeholder
-            command = command.replace("{output}", f'"{output_path}"')
-        
-        # If command doesn't contain explicit -i parameters, try to auto-fix
-        if command.startswith("ffmpeg ") and " -i " not in command:
-            # Insert input parameters after "ffmpeg"
-            command = command.replace("ffmpeg ", f"ffmpeg {input_params}", 1)
-        
-        # Ensure output directory exists
-        output_dir = os.path.dirname(output_path)
-        if output_dir and not os.path.exists(output_dir):
-            try:
-                os.makedirs(output_dir, exist_ok=True)
-            except Exception as e:
-                return (f"ERROR: Could not create output directory: {str(e)}", "")
+            # If command doesn't contain explicit -i parameters, try to auto-fix
+            if len(command) > 1 and command[0] == "ffmpeg" and "-i" not in command:
+                # Insert input parameters after "ffmpeg"
+                command[1:1] = input_argv
         
         try:
+            # Ensure output directory exists (the timestamped name keeps output_dir)
+            if output_dir and not os.path.exists(output_dir):
+                try:
+                    os.makedirs(output_dir, exist_ok=True)
+                except Exception as e:
+                    return (f"ERROR: Could not create output directory: {str(e)}", "")
+            
             # Log the command for debugging
-            print(f"[FFmpeg Node] Executing command: {command}")
+            print(f"[FFmpeg Node] Executing command: {shlex.join(command)}")
             
-            # Execute the FFmpeg command with real-time progress
-            return self._execute_ffmpeg_with_progress(command, output_path)
+            # Execute the FFmpeg command with real-time progress, waiting for a free slot first
+            with _FFMPEG_LIMITER.slot(max_concurrent):
+                result = self._execute_ffmpeg_with_progress(command, output_path, output_duration)
+                if smart_fallback and result[0].startswith("ERROR: FFmpeg failed"):
+                    fallback_command = smart_fallback()
+                    # The stream copy command doesn't depend on the encoder, don't run it twice
+                    if fallback_command and fallback_command != command:
+                        print("[FFmpeg Node] Hardware encoding failed, retrying with libx264")
+                        command = fallback_command
+                        print(f"[FFmpeg Node] Executing command: {shlex.join(command)}")
+                        result = self._execute_ffmpeg_with_progress(command, output_path, output_duration)
+                return result
                 
+        except _INTERRUPT_EXCEPTIONS:
+            raise
         except Exception as e:
-            error_msg = f"ERROR: Unexpected error running FFmpeg: {str(e)}. Command: {command}"
+            error_msg = f"ERROR: Unexpected error running FFmpeg: {str(e)}. Command: {shlex.join(command)}"
             return (error_msg, "")
+        finally:
+            # Remove the concat demuxer list written for the stream copy path
+            if concat_list_path and os.path.exists(concat_list_path):
+                os.remove(concat_list_path)
+    
+    def run_ffmpeg_batch(self, jobs, max_workers=None):
+        """
+        Run several FFmpeg jobs in parallel, for scripts that drive the node outside a graph.
+        jobs is a list of dicts of run_ffmpeg keyword arguments.
+        Returns a list of run_ffmpeg results (status_message, output_file_path) in job order.
+        """
+        if not jobs:
+            return []
+        max_workers = max_workers or _DEFAULT_MAX_CONCURRENT
+        
+        # Each job's ffmpeg is already a separate process, so worker threads only wait on it;
+        # the shared limiter still caps how many encode at the same time
+        workers = min(max_workers, len(jobs))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda job: self.run_ffmpeg(**{**job, 'concurrent_jobs': workers}), jobs))
     
-    def _execute_ffmpeg_with_progress(self, command, output_path):
+    def _execute_ffmpeg_with_progress(self, command, output_path, duration=None):
         """
-        Execute FFmpeg command with real-time progress display.
+        Execute FFmpeg command (an argv list) with real-time progress display.
+        duration is the expected output length in seconds, if known (see _pump_output).
         """
         process = subprocess.Popen(
-            command,
-            shell=True,
+            _with_progress_args(command),
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1
+            bufsize=0  # _iter_output_lines reads the raw pipe directly
         )
         
-        output_lines = []
-        duration = None
+        # Only the tail of the output is ever reported, so don't keep the rest
+        output_lines = deque(maxlen=_OUTPUT_TAIL_LINES)
+        events = queue.SimpleQueue()
+        last_print_time = 0.0
+        last_percent = -1
+        # ComfyUI's progress bar for the running node (reported per prompt and node)
+        progress_bar = comfy.utils.ProgressBar(100) if COMFYUI_AVAILABLE else None
         
         print(f"[FFmpeg Node] Starting FFmpeg process...")
         
         try:
+            # Drain and parse the pipe on a separate thread so ffmpeg never waits on us
+            _enlarge_pipe(process.stdout)
+            reader = threading.Thread(target=_pump_output, args=(process.stdout, events, duration), daemon=True)
+            reader.start()
+            
             while True:
-                line = process.stdout.readline()
-                if not line and process.poll() is not None:
-                    break
+                if _interrupt_requested():
+                    # Stop ffmpeg when the prompt is cancelled from the ComfyUI UI, then let
+                    # ComfyUI report the prompt as interrupted (and not cache this run)
+                    process.terminate()
+                    process.wait()
+                    reader.join()
+                    print("[FFmpeg Node] FFmpeg cancelled")
+                    model_management.throw_exception_if_processing_interrupted()
                 
-                if line:
-                    line = line.strip()
-                    output_lines.append(line)
-                    
-                    # Parse duration from FFmpeg output
-                    if "Duration:" in line and duration is None:
-                        duration_match = re.search(r'Duration: (\d{2}):(\d{2}):(\d{2})\.\d{2}', line)
-                        if duration_match:
-                            hours, minutes, seconds = map(int, duration_match.groups())
-                            duration = hours * 3600 + minutes * 60 + seconds
-                            print(f"[FFmpeg Node] Video duration: {duration}s")
-                    
-                    # Parse progress from FFmpeg output
-                    if "time=" in line and duration:
-                        time_match = re.search(r'time=(\d{2}):(\d{2}):(\d{2})\.\d{2}', line)
-                        if time_match:
-                            hours, minutes, seconds = map(int, time_match.groups())
-                            current_time = hours * 3600 + minutes * 60 + seconds
-                            progress_percent = min(100, (current_time / duration) * 100)
-                            
-                            # Extract additional info
-                            fps_match = re.search(r'fps=\s*(\d+\.?\d*)', line)
-                            speed_match = re.search(r'speed=\s*(\d+\.?\d*)x', line)
-                            
-                            fps = fps_match.group(1) if fps_match else "N/A"
-                            speed = speed_match.group(1) if speed_match else "N/A"
-                            
-                            print(f"[FFmpeg Node] Progress: {progress_percent:.1f}% ({current_time}/{duration}s) | FPS: {fps} | Speed: {speed}x")
+                try:
+                    event = events.get(timeout=0.1)
+                except queue.Empty:
+                    # Nothing new from ffmpeg yet, keep waiting
+                    continue
+                
+                kind = event[0]
+                if kind == 'eof':
+                    break
+                elif kind == 'log':
+                    output_lines.append(event[1])
+                elif kind == 'duration':
+                    print(f"[FFmpeg Node] Video duration: {event[1]}s")
+                elif kind == 'progress':
+                    _, progress_percent, current_time, duration, fps, speed = event
                     
-                    # Show other important messages
-                    elif any(keyword in line.lower() for keyword in ['error', 'warning', 'failed']):
-                        print(f"[FFmpeg Node] {line}")
+                    # Only print when the whole percent advanced and not too often,
+                    # but never skip the final 100% line
+                    now = time.monotonic()
+                    percent = int(progress_percent)
+                    if percent == last_percent:
+                        continue
+                    if percent < 100 and now - last_print_time < _PROGRESS_PRINT_INTERVAL:
+                        continue
+                    last_print_time, last_percent = now, percent
+                    if progress_bar:
+                        progress_bar.update_absolute(percent)
+                    print(f"[FFmpeg Node] Progress: {progress_percent:.1f}% ({current_time}/{duration}s) | FPS: {fps} | Speed: {speed}x")
+                elif kind == 'message':
+                    print(f"[FFmpeg Node] {event[1]}")
             
             # Wait for process to complete
             return_code = process.wait()
+            reader.join()
             
             # Collect all output for error reporting
             full_output = "\n".join(output_lines)
@@ -428,6 +1293,8 @@ class FFmpegNode:
                 warning_msg = f"WARNING: FFmpeg completed but output file not found: {output_path}"
                 return (warning_msg, "")
                 
+        except _INTERRUPT_EXCEPTIONS:
+            raise
         except Exception as e:
             process.kill()
             error_msg = f"ERROR: Exception during FFmpeg execution: {str(e)}"
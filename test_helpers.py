@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Unit checks for the FFmpeg node's output parsing and validation helpers.
+These don't run ffmpeg, ffprobe or ComfyUI.
+"""
+
+import io
+import os
+import sys
+import queue
+
+# Add the current directory to the path so we can import the node
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ffmpeg_node
+from ffmpeg_node import FFmpegNode, _StreamInfo
+
+failures = 0
+
+
+def check(description, condition, detail=""):
+    """Print the result of one check and count failures."""
+    global failures
+    if condition:
+        print(f"✅ {description}")
+    else:
+        failures += 1
+        print(f"❌ {description} {detail}")
+
+
+def pump(data, duration=None):
+    """Run _pump_output over data and return the events it produced."""
+    events = queue.SimpleQueue()
+    ffmpeg_node._pump_output(io.BytesIO(data), events, duration)
+    result = []
+    while not events.empty():
+        result.append(events.get())
+    return result
+
+
+def progress_block(seconds, state="continue"):
+    """One ffmpeg -progress report."""
+    return (f"frame={seconds * 30}\nfps=30.00\nout_time_us={seconds * 1000000}\n"
+            f"speed=2.0x\nprogress={state}\n").encode()
+
+
+def test_pump_output():
+    print("\n1. Testing _pump_output progress parsing...")
+    log = b"Input #0, mov,mp4\n  Duration: 00:00:10.00, start: 0.000000\n"
+    events = pump(log + progress_block(5) + progress_block(8, "end"))
+    progress = [event for event in events if event[0] == 'progress']
+    check("Duration is taken from the log without a precomputed one", ('duration', 10) in events, events)
+    check("Progress is reported against the log duration",
+          progress and progress[0][1:3] == (50.0, 5), progress)
+    check("FPS and speed are parsed", progress and progress[0][4:] == ("30.00", "2.0"), progress)
+    check("The final report counts as 100%", progress and progress[-1][1] == 100, progress)
+    check("Progress report lines are not logged",
+          not any(event[0] == 'log' and event[1].startswith(('frame=', 'progress=')) for event in events), events)
+    check("Events end with eof", events[-1] == ('eof',), events[-1:])
+
+    events = pump(log + progress_block(2), duration=8.0)
+    progress = [event for event in events if event[0] == 'progress']
+    check("A precomputed duration overrides the log duration",
+          events[0] == ('duration', 8.0) and progress and progress[0][1] == 25.0, events)
+
+    events = pump(b"[mp4 @ 0x1] Error opening output file\n")
+    check("Error lines are passed on as messages",
+          ('message', "[mp4 @ 0x1] Error opening output file") in events, events)
+
+    events = pump(progress_block(3))
+    check("No progress without any duration", not any(event[0] == 'progress' for event in events), events)
+
+
+def test_iter_output_lines():
+    print("\n2. Testing _iter_output_lines...")
+    data = b"first line\r\nstatus 1\rstatus 2\r\n\nlast line without newline"
+    original_chunk_size = ffmpeg_node._READ_CHUNK_SIZE
+    try:
+        # Small reads split lines (and \r\n pairs) across chunks
+        for chunk_size in (1, 3, 7, 1 << 20):
+            ffmpeg_node._READ_CHUNK_SIZE = chunk_size
+            lines = list(ffmpeg_node._iter_output_lines(io.BytesIO(data)))
+            check(f"Lines split on \\r and \\n with {chunk_size} byte reads",
+                  lines == ["first line", "status 1", "status 2", "last line without newline"], lines)
+    finally:
+        ffmpeg_node._READ_CHUNK_SIZE = original_chunk_size
+
+    lines = list(ffmpeg_node._iter_output_lines(io.BytesIO(b"bad \xff byte\n")))
+    check("Invalid UTF-8 is replaced instead of raising", lines == ["bad � byte"], lines)
+
+
+def test_parse_hints():
+    print("\n3. Testing SMART_CONCAT hint parsing...")
+    hints = ffmpeg_node._parse_hints("SMART_CONCAT trim1=1.5:4 trim2=0:3.25 crf=20 preset=slow")
+    check("All hints are parsed",
+          hints == {'t1s': '1.5', 't1e': '4', 't2s': '0', 't2e': '3.25', 'crf': '20', 'preset': 'slow'}, hints)
+
+    hints = ffmpeg_node._parse_hints("SMART_CONCAT crf=20 crf=30 trim1=1:2 trim1=3:4")
+    check("The first occurrence of each hint wins",
+          hints == {'crf': '20', 't1s': '1', 't1e': '2'}, hints)
+
+    hints = ffmpeg_node._parse_hints("SMART_CONCAT")
+    check("No hints in a plain SMART_CONCAT", hints == {}, hints)
+
+
+def test_can_stream_copy():
+    print("\n4. Testing _can_stream_copy...")
+    info = _StreamInfo(1920, 1080, 'h264', 'yuv420p', '30/1', '1/15360', 4.0)
+    whole = (0, 4.0, 0, 4.0)
+    check("Matching inputs kept whole can be copied", ffmpeg_node._can_stream_copy(info, info, 1920, 1080, whole))
+    check("Trimmed inputs must be re-encoded", not ffmpeg_node._can_stream_copy(info, info, 1920, 1080, (0.5, 4.0, 0, 4.0)))
+    check("Inputs must already have the target resolution",
+          not ffmpeg_node._can_stream_copy(info, info, 1080, 1080, whole))
+    check("Inputs must share a frame rate",
+          not ffmpeg_node._can_stream_copy(info, info._replace(frame_rate='25/1'), 1920, 1080, whole))
+    check("Inputs must share a codec",
+          not ffmpeg_node._can_stream_copy(info, info._replace(codec='hevc'), 1920, 1080, whole))
+    check("Unknown durations are never copied",
+          not ffmpeg_node._can_stream_copy(info._replace(duration=None), info, 1920, 1080, whole))
+
+
+def test_is_valid_url():
+    print("\n5. Testing URL validation...")
+    node = FFmpegNode()
+    for url in ["https://example.com/video.mp4", "http://localhost:8188/view?filename=a.mp4",
+                " HTTPS://EXAMPLE.COM/A.MP4 ", "http://a"]:
+        check(f"Valid URL accepted: {url!r}", node.is_valid_url(url))
+    for url in ["", "ftp://example.com/video.mp4", "http://", "http:///video.mp4",
+                "https://example.com/my video.mp4", "/tmp/video.mp4"]:
+        check(f"Invalid URL rejected: {url!r}", not node.is_valid_url(url))
+
+
+def test_split_command():
+    print("\n6. Testing custom command splitting...")
+    argv = ffmpeg_node._split_command('ffmpeg -i {input1} -vf "scale=640:-2" {output}')
+    check("Quoted arguments are kept together",
+          argv == ['ffmpeg', '-i', '{input1}', '-vf', 'scale=640:-2', '{output}'], argv)
+
+
+if __name__ == "__main__":
+    print("Testing FFmpeg Node helpers...")
+    test_pump_output()
+    test_iter_output_lines()
+    test_parse_hints()
+    test_can_stream_copy()
+    test_is_valid_url()
+    test_split_command()
+
+    if failures:
+        print(f"\n❌ {failures} helper check(s) failed")
+        sys.exit(1)
+    print("\n✅ FFmpeg Node helper tests completed!")
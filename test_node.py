@@ -33,6 +33,9 @@ def test_ffmpeg_node():
             input_mp4_1="",
             input_mp4_2="",
             output_path="",
+            video_length=4.0,
+            trim_start=0.5,
+            trim_end=0.5,
             ffmpeg_command="",
             execute=True
         )
@@ -48,6 +51,9 @@ def test_ffmpeg_node():
                 input_mp4_1=test_file,
                 input_mp4_2="",
                 output_path="/tmp/test_output.txt",
+                video_length=4.0,
+                trim_start=0.5,
+                trim_end=0.5,
                 ffmpeg_command="cp {input1} {output}",
                 execute=True
             )
@@ -62,6 +68,9 @@ def test_ffmpeg_node():
                 input_mp4_1=test_file,
                 input_mp4_2="",
                 output_path="/tmp/test_output.txt",
+                video_length=4.0,
+                trim_start=0.5,
+                trim_end=0.5,
                 ffmpeg_command="cp {input1} {output}",
                 execute=False
             )